@@ -1,18 +1,75 @@
 #Imports for 3 modes of execution: Real Hardware, Local Simulator, and Fake Backend
-from qiskit_ibm_runtime import QiskitRuntimeService, SamplerV2 as RealSampler
+# Only the local Aer sampler is imported here; the cloud/noise/fake-backend stacks are
+# heavy to import, so each MODE branch below imports what it needs itself
 from qiskit_aer.primitives import SamplerV2 as AerSampler
-from qiskit_aer.noise import NoiseModel
-from qiskit.providers.fake_provider import GenericBackendV2
+from aer_config import AER_OPTIONS, NOISELESS_AER_OPTIONS # Same simulator settings as the DJ script
 
 #Other imports
+import os
+import pickle
+import tempfile
+from pathlib import Path
 import numpy as np
-import matplotlib
-matplotlib.use('Qt5Agg')
-import matplotlib.pyplot as plt
-from qiskit.visualization import plot_histogram
 from qiskit import QuantumRegister, ClassicalRegister, QuantumCircuit
+from qiskit.circuit import CircuitInstruction, Barrier, Measure
+from qiskit.circuit.library import XGate, CXGate, CCXGate, SwapGate, HGate, SGate, YGate, RXGate, TGate, RYGate
 from qiskit.quantum_info import Statevector
-from qiskit.visualization import plot_bloch_multivector
+
+# VISUALIZE: draw circuits/plots at all (off for timing/benchmark runs)
+# INTERACTIVE: pop up blocking Qt windows; otherwise figures are saved as PNG files
+VISUALIZE = False
+INTERACTIVE = False
+if VISUALIZE:
+    # Matplotlib (and the Qt backend) is only loaded when something is drawn
+    import matplotlib
+    matplotlib.use('Qt5Agg' if INTERACTIVE else 'Agg')
+    import matplotlib.pyplot as plt
+    from qiskit.visualization import plot_histogram
+    from qiskit.visualization import plot_bloch_multivector
+
+
+# Noise models are cached per backend calibration snapshot, so NOISY_SIM only rebuilds one after recalibration
+NOISE_CACHE_DIR = Path.home() / ".cache" / "dj_noise"
+
+def load_noise_model(real_backend):
+    """Loads the backend's NoiseModel from the disk cache, or builds and caches it."""
+    from qiskit_aer.noise import NoiseModel
+    properties = real_backend.properties()
+    if properties is None or properties.last_update_date is None:
+        # No calibration snapshot to key the cache on: always build a fresh model
+        print(f"   Downloading noise model from: {real_backend.name} (no calibration data, not cached)...")
+        return NoiseModel.from_backend(real_backend)
+    
+    # File-name friendly key: backend name + time of the last calibration
+    last_update = properties.last_update_date
+    cache_key = f"{real_backend.name}_{last_update.strftime('%Y%m%dT%H%M%S')}"
+    cache_file = NOISE_CACHE_DIR / f"{cache_key}.pkl"
+    
+    if cache_file.exists():
+        print(f"   Loading cached noise model: {cache_file}")
+        try:
+            with open(cache_file, "rb") as f:
+                return pickle.load(f)
+        except Exception as err:
+            # Truncated file or pickle from an older qiskit-aer: rebuild and overwrite it
+            print(f"   Cached noise model unreadable ({type(err).__name__}), rebuilding it...")
+    
+    print(f"   Downloading noise model from: {real_backend.name}...")
+    noise_model = NoiseModel.from_backend(real_backend)
+    # Write to a temp file first, then swap it in, so an interrupted run never leaves a half-written cache
+    tmp_name = None
+    try:
+        NOISE_CACHE_DIR.mkdir(parents=True, exist_ok=True)
+        with tempfile.NamedTemporaryFile(dir=NOISE_CACHE_DIR, suffix=".tmp", delete=False) as f:
+            tmp_name = f.name
+            pickle.dump(noise_model, f)
+        os.replace(tmp_name, cache_file)
+    except OSError as err:
+        # A failed cache write (disk full, read-only ~/.cache, ...) only costs the cache
+        if tmp_name is not None and os.path.exists(tmp_name):
+            os.unlink(tmp_name)
+        print(f"   Could not cache noise model ({type(err).__name__}: {err}), continuing without cache...")
+    return noise_model
 
 
 #======= MODE SELECTION SECTION: "REAL", "NOISY_SIM", "FAST_FAKE_LOCAL"     ==========================================
@@ -23,30 +80,50 @@ print(f"Initializing MODE: {MODE}")
 if MODE == "REAL":
     # --- MODE 1: REAL HARDWARE ---
     # Costs money/quota. Long queue times.
+    from qiskit_ibm_runtime import QiskitRuntimeService, SamplerV2 as RealSampler
     service = QiskitRuntimeService()
     backend = service.least_busy(min_num_qubits=127)
     print(f"   Connected to: {backend.name}")
     sampler = RealSampler(mode=backend)
 elif MODE == "NOISY_SIM":
     # --- MODE 2: AER SIMULATOR (Real Noise Model) ---
-    # Free, runs locally, but takes time to download noise data.
+    # Free, runs locally; the noise data is only downloaded once per calibration (see load_noise_model).
+    from qiskit_ibm_runtime import QiskitRuntimeService
     service = QiskitRuntimeService()
     real_backend = service.least_busy(min_num_qubits=127)
-    print(f"   Downloading noise model from: {real_backend.name}...")
-    noise_model = NoiseModel.from_backend(real_backend)
-    print("   Noise model built.")
-    sampler = AerSampler(options={"backend_options": {"noise_model": noise_model}})
+    noise_model = load_noise_model(real_backend)
+    print("   Noise model ready.")
+    sampler = AerSampler(options={"backend_options": {**AER_OPTIONS, "noise_model": noise_model}})
 elif MODE == "FAST_FAKE_LOCAL":
     # --- MODE 3: AER SIMULATOR (Fake Backend) ---
     # Free, runs locally, but takes time to download noise data.
+    from qiskit.providers.fake_provider import GenericBackendV2
     fake_backend = GenericBackendV2(num_qubits=127) # Create a fake 127 qubit chip locally
     print(f"   Using fake backend: {fake_backend.name}")
-    sampler = AerSampler()
+    sampler = AerSampler(options={"backend_options": NOISELESS_AER_OPTIONS})
 else:
     raise ValueError("Invalid MODE selected. Choose REAL, NOISY_SIM, or FAST_FAKE_LOCAL")
 
 # =================================================================================
 
+def show_figure(fig, name):
+    """Shows the figure in a Qt window (INTERACTIVE) or saves it as <name>.png without blocking."""
+    if INTERACTIVE:
+        plt.show()
+    else:
+        fig.savefig(f"{name}.png")
+        plt.close(fig)
+
+def append_instructions(qc, instructions):
+    """Appends (gate, qubit indices, clbit indices) entries through the internal _append fast path."""
+    # Skips the per-gate argument validation/broadcasting of the public qc.x(), qc.cx(), ... methods
+    # qc.qubits / qc.clbits build a new list on every access, so read them once
+    qubits = qc.qubits
+    clbits = qc.clbits
+    for gate, qargs, cargs in instructions:
+        qc._append(CircuitInstruction(gate, [qubits[i] for i in qargs], [clbits[i] for i in cargs]))
+    return qc
+
 # Simple Circuit 1: Add and Swap
 
 def create_add_swap_circuit():
@@ -54,28 +131,28 @@ def create_add_swap_circuit():
     c = ClassicalRegister(2,"c")
     qc = QuantumCircuit(q,c)
     
-    # Quantum Half Adder
-    #Use NOT gates to initialize the qubits to 1
-    qc.x(0)
-    qc.x(1)
-    #Add a barrier to separate between sections, so that the transpiler does not cancel out the gates and better optimize the circuit
-    qc.barrier()
-    #Apply CNOT gates to the qubits (CNOT is the quantum equivalent of the XOR gate)
-    qc.cx(0,2)
-    qc.cx(1,2)
-
-    # Calculate the carry bit using a Toffoli gate (CCNOT)
-    qc.ccx(0,1,3)
-    qc.barrier()
-
-    #Swap gate demonstration
-    qc.swap(2,3)
-
-    # measure the output qubits to check for correctness
-    qc.measure(2,c[0])
-    qc.measure(3,c[1])
-    
-    return qc
+    return append_instructions(qc, [
+        # Quantum Half Adder
+        #Use NOT gates to initialize the qubits to 1
+        (XGate(), [0], []),
+        (XGate(), [1], []),
+        #Add a barrier to separate between sections, so that the transpiler does not cancel out the gates and better optimize the circuit
+        (Barrier(4), [0, 1, 2, 3], []),
+        #Apply CNOT gates to the qubits (CNOT is the quantum equivalent of the XOR gate)
+        (CXGate(), [0, 2], []),
+        (CXGate(), [1, 2], []),
+
+        # Calculate the carry bit using a Toffoli gate (CCNOT)
+        (CCXGate(), [0, 1, 3], []),
+        (Barrier(4), [0, 1, 2, 3], []),
+
+        #Swap gate demonstration
+        (SwapGate(), [2, 3], []),
+
+        # measure the output qubits to check for correctness
+        (Measure(), [2], [0]),
+        (Measure(), [3], [1]),
+    ])
 
 # Simple Circuit 2: Single Qubit Gates:H, S (Phase), Z, Y, RX/RY/RZ (Rotation)
 
@@ -84,164 +161,159 @@ def create_superposition_circuit():
     c = ClassicalRegister(1, 'c')
     qc = QuantumCircuit(q, c)
     
-    # Step 1: Create Superposition (Hadamard) -> |+>
-    qc.h(0)
-    
-    # Step 2: Phase Manipulation (S gate = 90 deg Z-rotation) -> |+i>
-    qc.s(0)
-    
-    # Step 3: Flip it around (Y gate)
-    qc.y(0)
-    
-    # Step 4: Fine-tuned Rotation (RX) - Arbitrary angle
-    # Rotating by Pi/3 around X-axis
-    qc.rx(np.pi/3, 0)
+    append_instructions(qc, [
+        # Step 1: Create Superposition (Hadamard) -> |+>
+        (HGate(), [0], []),
+        
+        # Step 2: Phase Manipulation (S gate = 90 deg Z-rotation) -> |+i>
+        (SGate(), [0], []),
+        
+        # Step 3: Flip it around (Y gate)
+        (YGate(), [0], []),
+        
+        # Step 4: Fine-tuned Rotation (RX) - Arbitrary angle
+        # Rotating by Pi/3 around X-axis
+        (RXGate(np.pi/3), [0], []),
+    ])
     
 
-    qc.draw("mpl")
-    plt.show()
-    qc.measure(0, 0)
-    return qc
+    if VISUALIZE:
+        show_figure(qc.draw("mpl"), "superposition_circuit")
+    return append_instructions(qc, [(Measure(), [0], [0])])
 
 def create_superposition_circuit_with_visualization():
     print("\n--- VISUALIZING SINGLE QUBIT MANIPULATION ---")
     
+    # Plain 2x2 gate matrices: each step is one small matmul instead of a circuit -> Operator conversion
+    h_gate = np.array([[1, 1], [1, -1]]) / np.sqrt(2)
+    s_gate = np.diag([1, 1j])
+    y_gate = np.array([[0, -1j], [1j, 0]])
+    # RX(theta) = cos(theta/2) I - i sin(theta/2) X
+    theta = np.pi/3
+    rx_gate = np.array([[np.cos(theta/2), -1j*np.sin(theta/2)],
+                        [-1j*np.sin(theta/2), np.cos(theta/2)]])
+    
     # Start with |0>
-    psi = Statevector.from_label('0')
+    psi = np.array([1, 0], dtype=complex)
     print("0. Initial State: |0>")
-    fig = plot_bloch_multivector(psi, title="Initial |0>") 
-    plt.show()
+    if VISUALIZE:
+        show_figure(plot_bloch_multivector(Statevector(psi), title="Initial |0>"), "bloch_step_0")
 
     # Step 1: Hadamard (H) -> |+> (Superposition)
     # H moves state from Z-axis (North Pole) to X-axis (Equator)
-    qc_h = QuantumCircuit(1)
-    qc_h.h(0)
-    psi = psi.evolve(qc_h)   
+    psi = h_gate @ psi
     print("1. After Hadamard (H): Moves to X-axis |+>")
-    plot_bloch_multivector(psi, title="After Hadamard (H)")
-    plt.show()
+    if VISUALIZE:
+        show_figure(plot_bloch_multivector(Statevector(psi), title="After Hadamard (H)"), "bloch_step_1")
 
     # Step 2: S Gate (Phase) -> |+i>
     # S rotates 90 degrees around Z-axis. Moves from X-axis to Y-axis.
-    qc_s = QuantumCircuit(1)
-    qc_s.s(0)
-    psi = psi.evolve(qc_s)
+    psi = s_gate @ psi
     print("2. After S-Gate: Rotates 90° around Z-axis to Y-axis |+i>")
-    plot_bloch_multivector(psi, title="After S-Gate") 
-    plt.show()
+    if VISUALIZE:
+        show_figure(plot_bloch_multivector(Statevector(psi), title="After S-Gate"), "bloch_step_2")
 
     # Step 3: Y Gate -> |-i>
     # Y rotates 180° around Y-axis. Flips the state across the sphere.
-    qc_y = QuantumCircuit(1)
-    qc_y.y(0)
-    psi = psi.evolve(qc_y)
+    psi = y_gate @ psi
     print("3. After Y-Gate: Flips 180° around Y-axis")
-    plot_bloch_multivector(psi, title="After Y-Gate") 
-    plt.show()
+    if VISUALIZE:
+        show_figure(plot_bloch_multivector(Statevector(psi), title="After Y-Gate"), "bloch_step_3")
 
     # Step 4: RX(pi/3) -> Rotation
     # Rotates by 60 degrees around X-axis. Lifts vector off the equator.
-    qc_rx = QuantumCircuit(1)
-    qc_rx.rx(np.pi/3, 0)
-    psi = psi.evolve(qc_rx)
+    psi = rx_gate @ psi
     print("4. After RX(pi/3): Rotates 60° around X-axis (lifts up)")
-    plot_bloch_multivector(psi, title="After RX(pi/3)") 
-    plt.show()
+    if VISUALIZE:
+        show_figure(plot_bloch_multivector(Statevector(psi), title="After RX(pi/3)"), "bloch_step_4")
  
 
     # Return a circuit for the actual hardware run (measurement added)
     qc_final = QuantumCircuit(1, 1)
-    qc_final.h(0)
-    qc_final.s(0)
-    qc_final.y(0)
-    qc_final.rx(np.pi/3, 0)
-    qc_final.measure(0, 0)
-    return qc_final
+    return append_instructions(qc_final, [
+        (HGate(), [0], []),
+        (SGate(), [0], []),
+        (YGate(), [0], []),
+        (RXGate(np.pi/3), [0], []),
+        (Measure(), [0], [0]),
+    ])
 
 # Demonstrates: H, CX, T (pi/4 Phase), Dynamic Construction
 def create_entanglement_circuit():
-    circuits = []
-    titles = []
-    
+    # Each step only adds its own gate to a copy of the previous step (measurements come last)
     # First step: Standard Bell State Creation (|00> + |11>)
-    qc1 = QuantumCircuit(2)
-    qc1.h(0)
-    qc1.measure_all()
-    circuits.append(qc1)
-    titles.append("Step 1: after H --> |00>+|01>")
+    qc1 = append_instructions(QuantumCircuit(2), [(HGate(), [0], [])])
     #Second step: after CNOT on Qubit 0 and 1
-    qc2 = QuantumCircuit(2)
-    qc2.h(0)
-    qc2.cx(0, 1)
-    qc2.measure_all()
-    circuits.append(qc2)
-    titles.append("Step 2: after CNOT --> |00>+|11>")
+    qc2 = append_instructions(qc1.copy(), [(CXGate(), [0, 1], [])])
     #Third step: Bell + T (phase change, hidden in counts)
-    qc3 = QuantumCircuit(2)
-    qc3.h(0)
-    qc3.cx(0, 1)
-    qc3.t(1)
-    qc3.measure_all()
-    circuits.append(qc3)
-    titles.append("Step 3: after T --> |00>+|11> + phase change")
-
+    qc3 = append_instructions(qc2.copy(), [(TGate(), [1], [])])
     #Fourth step: Rotate Qubit 0 to see how entanglement persists
-    qc4 = QuantumCircuit(2)
-    qc4.h(0)
-    qc4.cx(0, 1)
-    qc4.t(1)
-    qc4.ry(np.pi/2, 0)
-    qc4.measure_all()
-    circuits.append(qc4)
-    titles.append("Step 4: after Ry(pi/2) --> |00>+|11> + phase change + RY(0)")
+    qc4 = append_instructions(qc3.copy(), [(RYGate(np.pi/2), [0], [])])
+
+    circuits = [qc1, qc2, qc3, qc4]
+    for qc in circuits:
+        qc.measure_all()
+    titles = ["Step 1: after H --> |00>+|01>",
+              "Step 2: after CNOT --> |00>+|11>",
+              "Step 3: after T --> |00>+|11> + phase change",
+              "Step 4: after Ry(pi/2) --> |00>+|11> + phase change + RY(0)"]
 
     return circuits, titles
 
 
 # Execution playgrounds
+# Every section adds its circuits to this list; they all go to the sampler in ONE job
+circuits = []
+titles = []
+
 # ======================== 1+1 half adder + swap circuit  ==================================
 
 #     # Setup and draw the circuit
 # print("Generating add and swap circuits...")
 # add_swap_circuit = create_add_swap_circuit()
-# add_swap_circuit.draw("mpl")
-# plt.show()
-
-#     #Run the circuit on simulator or real hardware
-# job = sampler.run([add_swap_circuit])
-# print("waiting for the result...")
-# result = job.result()
-# data_pub = result[0].data.c
-# counts = data_pub.get_counts()
-# plot_histogram(counts)
-# plt.title("Add and Swap Circuit Results")
-# plt.show()
+# if VISUALIZE:
+#     show_figure(add_swap_circuit.draw("mpl"), "add_swap_circuit")
+# circuits.append(add_swap_circuit)
+# titles.append("Add and Swap Circuit Results")
 
 
 
 # ======================== Single qubit Gates ==================================
 # # Setup and draw the circuit
 # qc_super = create_superposition_circuit()
+# circuits.append(qc_super)
+# titles.append("Single Qubit Gates: H, S, Y, RX(pi/3)")
 # #Visualize the single qubit evolution on bloch sphere
 # qc_super_visual = create_superposition_circuit_with_visualization()
 
 
 
 # ======================== Entanglement Master: "The Bell-State Mixer" ==================================
-circuits, titles = create_entanglement_circuit()
+entangle_circuits, entangle_titles = create_entanglement_circuit()
+
+if VISUALIZE:
+    print("Drawing the last circuit...")
+    show_figure(entangle_circuits[-1].draw("mpl"), "entanglement_circuit")
+circuits += entangle_circuits
+titles += entangle_titles
+
 
-print("Drawing the last circuit...")
-circuits[-1].draw("mpl")
-plt.show()
 
-print("Running the circuit on simulator or real hardware...")
+# ======================== Run every circuit in a single job ==================================
+print("Running the circuits on simulator or real hardware...")
 job = sampler.run(circuits)
 result = job.result()
 
+if VISUALIZE:
+    # One figure with a histogram per circuit instead of a new figure (and window) per circuit
+    fig, axes = plt.subplots(1, len(titles), figsize=(4*len(titles), 3), squeeze=False)
 for i, title in enumerate(titles):
-    data_pub = result[i].data.meas
+    # Counts live under the circuit's own classical register ('c' or 'meas')
+    data_pub = getattr(result[i].data, circuits[i].cregs[0].name)
     counts = data_pub.get_counts()
     print(f"{title}: {counts}")
-    plot_histogram(counts)
-    plt.title(title)
-    plt.show()
+    if VISUALIZE:
+        plot_histogram(counts, ax=axes[0][i], bar_labels=False)
+        axes[0][i].set_title(title)
+if VISUALIZE:
+    show_figure(fig, "results")
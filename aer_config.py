@@ -0,0 +1,10 @@
+# Aer simulator options shared by Deutsch-Jozsa Algorithm.py and SimpleCircuits.py
+# run the circuits of one job in parallel, fuse gates, no qubit truncation
+AER_OPTIONS = {
+    "max_parallel_experiments": 0,
+    "fusion_enable": True,
+    "enable_truncation": False,
+}
+# Noiseless runs: pin the statevector method. Noisy runs keep Aer's automatic method,
+# which picks density_matrix and is several times faster than one statevector trajectory per shot
+NOISELESS_AER_OPTIONS = {**AER_OPTIONS, "method": "statevector"}
@@ -0,0 +1,17 @@
+# Numba version of the classical DJ search, imported by Deutsch-Jozsa Algorithm.py only for large n
+# (its own file so the njit cache works and numba is never loaded for small runs)
+from numba import njit, prange
+
+@njit(parallel=True, cache=True)
+def first_difference_balanced(n, limit, block_size):
+    """Returns the first input below limit where the balanced f(x) differs from f(0) = 0, or -1."""
+    # Blocks run in order so the search stops at the first block with a hit, like the NumPy search
+    for start in range(0, limit, block_size):
+        stop = min(start + block_size, limit)
+        first = stop
+        for i in prange(start, stop):
+            # Parallel min-reduction over the inputs where f(x) = x0 XOR x1 is 1
+            first = min(first, i if ((i >> (n - 1)) ^ (i >> (n - 2))) & 1 else stop)
+        if first < stop:
+            return first
+    return -1